@@ -0,0 +1,32 @@
+# Per-frame timing: read + scale to 640x480 with each decode backend
+# python bench_decode.py video_1080p.mp4 [jumlah_frame]
+import sys
+import time
+
+from video_source import open_video_source
+
+path = sys.argv[1] if len(sys.argv) > 1 else "sc/tester.mp4"
+n_frames = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+for backend in ('opencv', 'pyav'):
+    try:
+        src = open_video_source(path, 640, 480, backend=backend)
+    except Exception as e:
+        print(f"{backend}: tidak tersedia ({e})")
+        continue
+    if not src.isOpened():
+        print(f"{backend}: video tidak bisa dibuka")
+        continue
+
+    read = 0
+    start = time.perf_counter()
+    while read < n_frames:
+        ret, frame = src.read()
+        if not ret:
+            break
+        read += 1
+    elapsed = time.perf_counter() - start
+    src.release()
+
+    if read:
+        print(f"{backend}: {read} frame, {elapsed / read * 1000:.2f} ms/frame")
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+from queue import Queue, Empty
+
+
+class CheckpointWriter:
+    """Writes job checkpoints (frame position + counting state) from a background thread."""
+
+    VERSION = 1
+
+    def __init__(self, source, interval_s=10.0):
+        self.source = source
+        self.path = self.path_for(source)
+        self.interval_s = interval_s
+
+        # Latest state only; older pending snapshots are dropped (same as the GUI frame queue)
+        self._queue = Queue(maxsize=1)
+        self._discarded = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def path_for(source):
+        """Checkpoint file lives next to the video."""
+        return f"{source}.ckpt.json"
+
+    @classmethod
+    def remove(cls, source):
+        """Delete the checkpoint of a video (no writer needed)."""
+        path = cls.path_for(source)
+        for p in (path, path + '.tmp'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _source_signature(source):
+        try:
+            stat = os.stat(source)
+            return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+        except OSError:
+            return None
+
+    @classmethod
+    def load(cls, source):
+        """Return the saved state for this video, or None if missing/stale/corrupt."""
+        path = cls.path_for(source)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('version') != cls.VERSION:
+            return None
+        # Video file changed since checkpoint was written
+        if state.get('signature') != cls._source_signature(source):
+            return None
+        return state
+
+    def submit(self, state):
+        """Queue a state snapshot for writing (non-blocking)."""
+        if self._discarded:
+            return
+        state = dict(state, version=self.VERSION, signature=self._source_signature(self.source))
+        try:
+            if self._queue.full():
+                try:
+                    self._queue.get_nowait()
+                except Empty:
+                    pass
+            self._queue.put_nowait(state)
+        except Exception:
+            # Never crash detector thread because checkpointing failed
+            pass
+
+    def _write_loop(self):
+        while True:
+            state = self._queue.get()
+            if state is None:
+                return
+            with self._lock:
+                if self._discarded:
+                    continue
+                try:
+                    # Atomic replace so a crash mid-write keeps the previous checkpoint
+                    tmp_path = self.path + '.tmp'
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(state, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                except Exception as e:
+                    print(f"Checkpoint write failed: {e}")
+
+    def close(self, final_state=None, completed=False):
+        """Flush the final state and stop the writer; remove the checkpoint if the job completed."""
+        if completed:
+            self.discard()
+        elif final_state is not None:
+            self.submit(final_state)
+        # Sentinel goes after the final state (blocking put, writer is draining)
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+    def discard(self):
+        """Drop pending/future writes and delete the checkpoint file."""
+        with self._lock:
+            self._discarded = True
+            self.remove(self.source)
@@ -1,13 +1,32 @@
 import cv2
 import time
+import numpy as np
 import torch
 from queue import Queue, Empty
 
+from resolution_controller import ResolutionController
+
+
+# One row per tracked box, same column order as ultralytics Boxes.data when tracking
+BOX_DTYPE = np.dtype([
+    ('xyxy', np.float32, (4,)),
+    ('id', np.float32),
+    ('conf', np.float32),
+    ('cls', np.float32),
+])
+
+VEHICLE_COLORS = {
+    'mobil': (52, 152, 219),
+    'motor': (155, 89, 182),
+    'bus': (230, 126, 34),
+    'truck': (231, 76, 60)
+}
+
 
 class DetectorEngine:
     """Handles vehicle detection, tracking, and counting logic."""
     
-    def __init__(self, model, device, vehicle_classes, confidence_threshold):
+    def __init__(self, model, device, vehicle_classes, confidence_threshold, track_capabilities=None):
         self.model = model
         self.device = device
         self.vehicle_classes = vehicle_classes
@@ -29,13 +48,44 @@ class DetectorEngine:
         self.total_frames = 0
         self.detection_count = 0
         
+        # Resume: tracker IDs restart after a resume, remap them past the restored IDs
+        self.resume_match_radius = 60   # px, re-associate new tracks with restored live tracks
+        self.resume_match_frames = 30   # frames during which restored tracks can be re-associated
+        self.completed = False
+        
         # Frame queue for GUI
         self.frame_queue = Queue(maxsize=1)
         
-        # Track call mode optimization
-        self._track_call_mode = 0  # 0=unknown, 1=half+imgsz ok, 2=imgsz ok, 3=basic only
+        # Track call optimization (capabilities probed once by DeviceManager at load time)
+        if track_capabilities is None:
+            track_capabilities = {'imgsz': True, 'half': False}
+        self.track_capabilities = track_capabilities
         self.infer_imgsz = 640
-        self.use_half = (self.device == 'cuda')
+        self.use_half = (self.device == 'cuda') and track_capabilities['half']
+        
+        # Per-frame timing (EMA, ms): model.track call, box conversion + unpacking (shown next to FPS)
+        self.timing_ms = {'infer': None, 'transfer': None}
+        
+        # Closed-loop inference size control (latency budget)
+        self.resolution_controller = ResolutionController(device=self.device, initial_size=self.infer_imgsz)
+        self.infer_imgsz = self.resolution_controller.current_size
+        
+        # Reused call arguments, only conf/imgsz are updated in place when they change
+        self._track_kwargs = dict(
+            conf=self.confidence_threshold,
+            iou=0.5,
+            persist=True,
+            verbose=False,
+            classes=list(self.vehicle_classes.keys()),
+            device=self.device,
+        )
+        if track_capabilities['imgsz']:
+            self._track_kwargs['imgsz'] = self.infer_imgsz
+        else:
+            # imgsz can't be passed to this ultralytics version, nothing to autotune
+            self.resolution_controller.enabled = False
+        if self.use_half:
+            self._track_kwargs['half'] = True
         
         self.reset_counters()
     
@@ -52,37 +102,114 @@ class DetectorEngine:
         self.counted_ids = set()
         self.total_frames = 0
         self.detection_count = 0
+        self.resolution_controller.reset()
+        self.track_id_offset = 0
+        self.max_track_id = -1
+        self._track_aliases = {}
+        self._restored_tracks = {}
+        self._restore_frames_left = 0
+        self._live_tracks = []
+        self.completed = False
     
-    def _track(self, frame):
-        """Call model.track with a safe fallback for ultralytics version differences."""
-        base_kwargs = dict(
-            conf=self.confidence_threshold,
-            iou=0.5,
-            persist=True,
-            verbose=False,
-            classes=list(self.vehicle_classes.keys()),
-            device=self.device,
-        )
+    def snapshot_state(self, frame_index):
+        """Copy of the counting state for a checkpoint (JSON serializable).
 
-        if self._track_call_mode == 0:
-            try:
-                out = self.model.track(frame, imgsz=self.infer_imgsz, half=self.use_half, **base_kwargs)
-                self._track_call_mode = 1
-                return out
-            except TypeError:
-                try:
-                    out = self.model.track(frame, imgsz=self.infer_imgsz, **base_kwargs)
-                    self._track_call_mode = 2
-                    return out
-                except TypeError:
-                    self._track_call_mode = 3
-                    return self.model.track(frame, **base_kwargs)
+        Only tracks visible in the last frame are saved; older IDs can never
+        reappear after a resume because new IDs start past max_track_id.
+        """
+        tracked = self.tracked_vehicles
+        live_state = {}
+        for track_id, _, _, _ in self._live_tracks:
+            if track_id in tracked:
+                live_state[str(track_id)] = dict(tracked[track_id])
+        return {
+            'frame_index': int(frame_index),
+            'vehicle_counts': dict(self.vehicle_counts),
+            'counted_ids': [int(i) for i in self.counted_ids],
+            'max_track_id': self.max_track_id,
+            'tracked_vehicles': live_state,
+            'live_tracks': [list(t) for t in self._live_tracks],
+            'total_frames': self.total_frames,
+            'detection_count': self.detection_count,
+            'infer_imgsz': self.infer_imgsz,
+        }
+    
+    def restore_state(self, state):
+        """Restore counting state from a checkpoint (call after reset_counters)."""
+        self.vehicle_counts.update(state['vehicle_counts'])
+        self.counted_ids = set(state['counted_ids'])
+        self.tracked_vehicles = {int(k): v for k, v in state['tracked_vehicles'].items()}
+        self.total_frames = state['total_frames']
+        self.detection_count = state['detection_count']
+        
+        imgsz = state.get('infer_imgsz')
+        if imgsz in self.resolution_controller.sizes:
+            self.resolution_controller.current_size = imgsz
+            self.infer_imgsz = imgsz
+        
+        # New tracker IDs must not collide with any ID used before the checkpoint
+        known_ids = self.counted_ids | set(self.tracked_vehicles)
+        self.max_track_id = max(state.get('max_track_id', -1), max(known_ids) if known_ids else -1)
+        self.track_id_offset = self.max_track_id + 1
+        
+        # Vehicles visible at checkpoint time: (id, type, x, y)
+        self._restored_tracks = {int(t[0]): (t[1], t[2], t[3]) for t in state.get('live_tracks', [])}
+        self._restore_frames_left = self.resume_match_frames
+    
+    def _resolve_track_id(self, raw_id, vehicle_type, centroid_x, centroid_y):
+        """Map a tracker ID to a counting ID (re-associating vehicles live at resume time)."""
+        track_id = int(raw_id) + self.track_id_offset
+        alias = self._track_aliases.get(track_id)
+        if alias is not None:
+            return alias
+        
+        if self._restored_tracks and track_id not in self.tracked_vehicles:
+            best_id = None
+            best_dist = self.resume_match_radius ** 2
+            for old_id, (old_type, old_x, old_y) in self._restored_tracks.items():
+                if old_type != vehicle_type:
+                    continue
+                dist = (old_x - centroid_x) ** 2 + (old_y - centroid_y) ** 2
+                if dist <= best_dist:
+                    best_id, best_dist = old_id, dist
+            if best_id is not None:
+                del self._restored_tracks[best_id]
+                self._track_aliases[track_id] = best_id
+                return best_id
+        
+        if track_id > self.max_track_id:
+            self.max_track_id = track_id
+        return track_id
+    
+    def _track(self, frame):
+        """Call model.track with the preallocated kwargs."""
+        kwargs = self._track_kwargs
+        if kwargs['conf'] != self.confidence_threshold:
+            kwargs['conf'] = self.confidence_threshold
+        if 'imgsz' in kwargs and kwargs['imgsz'] != self.infer_imgsz:
+            kwargs['imgsz'] = self.infer_imgsz
+        return self.model.track(frame, **kwargs)
+    
+    def _update_timing(self, key, value_ms):
+        """EMA of a per-frame timing, seeded with the first measurement."""
+        prev = self.timing_ms[key]
+        self.timing_ms[key] = value_ms if prev is None else prev + 0.1 * (value_ms - prev)
+    
+    @staticmethod
+    def _boxes_to_host(boxes):
+        """Unpack all box fields with one conversion into a BOX_DTYPE structured array.
 
-        if self._track_call_mode == 1:
-            return self.model.track(frame, imgsz=self.infer_imgsz, half=self.use_half, **base_kwargs)
-        if self._track_call_mode == 2:
-            return self.model.track(frame, imgsz=self.infer_imgsz, **base_kwargs)
-        return self.model.track(frame, **base_kwargs)
+        Replaces four per-field .cpu().numpy() calls. With tracking enabled ultralytics
+        already builds Boxes.data on the CPU from the tracker output, so this saves tensor
+        ops and Python overhead rather than device-to-host copies.
+        """
+        data = boxes.data
+        # Only called when boxes.id is set, i.e. the tracked 7-column layout
+        assert data.shape[1] == 7, f"unexpected Boxes.data layout {tuple(data.shape)}"
+        if isinstance(data, torch.Tensor):
+            data = data.to(dtype=torch.float32).cpu().numpy()
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        return data.view(BOX_DTYPE).reshape(-1)
     
     def push_frame(self, frame):
         """Push latest frame for GUI thread (drop old frames if GUI is slow)."""
@@ -99,22 +226,34 @@ class DetectorEngine:
             # Never crash detector thread because GUI queue failed
             pass
     
-    def detect_loop(self, cap, is_running_callback, update_stats_callback, update_fps_callback, root):
+    def detect_loop(self, cap, is_running_callback, update_stats_callback, update_fps_callback, root,
+                    checkpoint=None):
         """Main detection loop - GPU OPTIMIZED"""
         fps_counter = 0
         fps_start_time = time.time()
+        last_checkpoint_time = time.time()
         
         try:
             while is_running_callback() and cap.isOpened():
                 ret, frame = cap.read()
                 if not ret:
+                    self.completed = True
                     break
                 
                 self.total_frames += 1
-                frame = cv2.resize(frame, (self.frame_width, self.frame_height))
+                # Scaling video sources already deliver frame_width x frame_height
+                if frame.shape[1] != self.frame_width or frame.shape[0] != self.frame_height:
+                    frame = cv2.resize(frame, (self.frame_width, self.frame_height))
                 
                 # YOLO TRACKING dengan GPU
+                infer_start = time.perf_counter()
                 results = self._track(frame)
+                infer_ms = (time.perf_counter() - infer_start) * 1000.0
+                self._update_timing('infer', infer_ms)
+                zone_occupied = False
+                box_heights_sum = 0
+                box_heights_n = 0
+                live_tracks = []
                 
                 # Draw counting zone
                 zone_top = self.counting_line_y - self.line_offset
@@ -134,27 +273,30 @@ class DetectorEngine:
                 # Process detections
                 if results[0].boxes.id is not None:
                     self.detection_count += 1
-                    boxes = results[0].boxes
-                    track_ids = boxes.id.int().cpu().numpy()
-                    classes = boxes.cls.int().cpu().numpy()
-                    confs = boxes.conf.cpu().numpy()
-                    xyxys = boxes.xyxy.int().cpu().numpy()
+                    transfer_start = time.perf_counter()
+                    dets = self._boxes_to_host(results[0].boxes)
+                    # Plain Python ints/floats: cheaper in the per-box loop than NumPy scalars
+                    track_ids = dets['id'].astype(np.int32).tolist()
+                    classes = dets['cls'].astype(np.int32).tolist()
+                    confs = dets['conf'].tolist()
+                    xyxys = dets['xyxy'].astype(np.int32).tolist()
+                    transfer_ms = (time.perf_counter() - transfer_start) * 1000.0
+                    self._update_timing('transfer', transfer_ms)
                     
                     for track_id, class_id, conf, xyxy in zip(track_ids, classes, confs, xyxys):
                         if class_id in self.vehicle_classes:
                             vehicle_type = self.vehicle_classes[class_id]
                             
-                            x1, y1, x2, y2 = map(int, xyxy)
+                            x1, y1, x2, y2 = xyxy
                             centroid_x = (x1 + x2) // 2
                             centroid_y = (y1 + y2) // 2
+                            box_heights_sum += y2 - y1
+                            box_heights_n += 1
                             
-                            colors_map = {
-                                'mobil': (52, 152, 219),
-                                'motor': (155, 89, 182),
-                                'bus': (230, 126, 34),
-                                'truck': (231, 76, 60)
-                            }
-                            color = colors_map.get(vehicle_type, (255, 255, 255))
+                            track_id = self._resolve_track_id(track_id, vehicle_type, centroid_x, centroid_y)
+                            live_tracks.append((track_id, vehicle_type, centroid_x, centroid_y))
+                            
+                            color = VEHICLE_COLORS.get(vehicle_type, (255, 255, 255))
                             
                             cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
                             cv2.circle(frame, (centroid_x, centroid_y), 4, color, -1)
@@ -164,9 +306,10 @@ class DetectorEngine:
                                       cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 2)
                             
                             # COUNTING LOGIC
+                            in_zone = (zone_top <= centroid_y <= zone_bottom)
+                            zone_occupied = zone_occupied or in_zone
+                            
                             if track_id not in self.counted_ids:
-                                in_zone = (zone_top <= centroid_y <= zone_bottom)
-                                
                                 if track_id in self.tracked_vehicles:
                                     prev_y = self.tracked_vehicles[track_id]['prev_y']
                                     prev_in_zone = self.tracked_vehicles[track_id].get('was_in_zone', False)
@@ -191,6 +334,29 @@ class DetectorEngine:
                                     'was_in_zone': in_zone
                                 }
                 
+                self._live_tracks = live_tracks
+                if self._restore_frames_left > 0:
+                    self._restore_frames_left -= 1
+                    if self._restore_frames_left == 0:
+                        self._restored_tracks = {}
+                
+                # Periodic checkpoint (state copied here, written by the checkpoint thread)
+                if checkpoint is not None and time.time() - last_checkpoint_time >= checkpoint.interval_s:
+                    checkpoint.submit(self.snapshot_state(cap.frame_index))
+                    last_checkpoint_time = time.time()
+                
+                # Input size autotuning (switch only when the counting zone is empty)
+                self.resolution_controller.update(
+                    infer_ms,
+                    has_detections=box_heights_n > 0,
+                    mean_box_height=(box_heights_sum / box_heights_n) if box_heights_n else None
+                )
+                new_imgsz = self.resolution_controller.propose(safe_point=not zone_occupied)
+                if new_imgsz is not None:
+                    print(f"Inference size -> {new_imgsz} (latency {self.resolution_controller.latency_ema:.1f} ms, "
+                          f"budget {self.resolution_controller.target_latency_ms:.0f} ms)")
+                    self.infer_imgsz = new_imgsz
+                
                 # FPS calculation
                 fps_counter += 1
                 if time.time() - fps_start_time >= 1.0:
@@ -218,7 +384,8 @@ class DetectorEngine:
                     if self.device == 'cuda':
                         gpu_mem = torch.cuda.memory_allocated() / 1024**3
                     
-                    root.after(0, lambda: update_fps_callback(fps, fps_color, detection_rate, gpu_mem))
+                    timing = dict(self.timing_ms)
+                    root.after(0, lambda: update_fps_callback(fps, fps_color, detection_rate, gpu_mem, timing))
                     
                     fps_counter = 0
                     fps_start_time = time.time()
@@ -229,3 +396,7 @@ class DetectorEngine:
             print(f"Error: {e}")
             import traceback
             traceback.print_exc()
+        
+        # Final checkpoint from this thread, before anyone can reset the engine (removed if the video finished)
+        if checkpoint is not None:
+            checkpoint.close(final_state=self.snapshot_state(cap.frame_index), completed=self.completed)
@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 from tkinter import messagebox
 from ultralytics import YOLO
@@ -89,3 +90,29 @@ class DeviceManager:
             print(f"Error loading model: {e}")
             messagebox.showerror("Error", f"Failed to load model: {e}")
             raise
+    
+    @staticmethod
+    def probe_track_capabilities(model, device, imgsz=640, frame_size=(640, 480)):
+        """Probe once which inference kwargs this ultralytics version accepts (also warms up the model)."""
+        dummy = np.zeros((frame_size[1], frame_size[0], 3), dtype=np.uint8)
+        candidates = []
+        if device == 'cuda':
+            candidates.append({'imgsz': True, 'half': True})
+        candidates.append({'imgsz': True, 'half': False})
+        candidates.append({'imgsz': False, 'half': False})
+        
+        # predict() instead of track() so no tracker state is created by the probe
+        for caps in candidates:
+            kwargs = dict(verbose=False, device=device)
+            if caps['imgsz']:
+                kwargs['imgsz'] = imgsz
+            if caps['half']:
+                kwargs['half'] = True
+            try:
+                model.predict(dummy, **kwargs)
+                print(f"Track capabilities: imgsz={caps['imgsz']}, half={caps['half']}")
+                return caps
+            except TypeError:
+                continue
+        
+        return {'imgsz': False, 'half': False}
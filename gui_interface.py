@@ -221,9 +221,14 @@ class GUIInterface:
             else:
                 self.percentage_labels[vehicle].config(text="(0%)")
     
-    def update_fps_display(self, fps, fps_color, detection_rate, gpu_mem):
+    def update_fps_display(self, fps, fps_color, detection_rate, gpu_mem, timing_ms=None):
         """Update FPS and performance metrics."""
-        self.fps_label.config(text=f"FPS: {fps:.1f}", fg=fps_color)
+        text = f"FPS: {fps:.1f}"
+        if timing_ms is not None and timing_ms['infer'] is not None:
+            text += f" | infer {timing_ms['infer']:.1f} ms"
+            if timing_ms['transfer'] is not None:
+                text += f" | boxes {timing_ms['transfer']:.2f} ms"
+        self.fps_label.config(text=text, fg=fps_color)
         self.detect_rate_label.config(text=f"")
         
         if self.device == 'cuda' and gpu_mem is not None:
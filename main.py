@@ -1,4 +1,3 @@
-import cv2
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import threading
@@ -6,6 +5,8 @@ import threading
 from device_manager import DeviceManager
 from detector_engine import DetectorEngine
 from gui_interface import GUIInterface
+from video_source import open_video_source
+from checkpoint import CheckpointWriter
 
 
 class TrafficDetectorGPU:
@@ -20,6 +21,7 @@ class TrafficDetectorGPU:
         
         # Load model dengan GPU
         self.model = DeviceManager.load_model(self.device)
+        self.track_capabilities = DeviceManager.probe_track_capabilities(self.model, self.device)
         
         # kals kendaraan
         self.vehicle_classes = {
@@ -34,13 +36,22 @@ class TrafficDetectorGPU:
             model=self.model,
             device=self.device,
             vehicle_classes=self.vehicle_classes,
-            confidence_threshold=0.5
+            confidence_threshold=0.5,
+            track_capabilities=self.track_capabilities
         )
         
-        # Video capture
+        # Video capture ('auto' = PyAV decoder-side scaling if installed, else OpenCV)
+        self.video_backend = 'auto'
         self.cap = None
+        self.source = None
+        self.checkpoint_interval_s = 10.0
         self.is_running = False
         self.video_thread = None
+        self.resume_skip_chunk = 250  # frames decoded between stop checks while resuming
+        
+        # Set while waiting for the detector thread (Tk events are pumped meanwhile)
+        self._switching = False
+        self._closing = False
         
         # Initialize GUI
         self.gui = GUIInterface(self.root, self.device, self.detector_engine)
@@ -67,41 +78,156 @@ class TrafficDetectorGPU:
     
     def select_video(self):
         """Open file dialog to select video."""
+        if self._switching:
+            return
         file_path = filedialog.askopenfilename(
             title="Pilih Video",
             filetypes=[("Video files", "*.mp4 *.avi *.mov *.mkv"), ("All files", "*.*")]
         )
         if file_path:
-            self.start_detection(file_path)
+            resume = False
+            state = CheckpointWriter.load(file_path)
+            if state is not None:
+                total = sum(state['vehicle_counts'].values())
+                resume = messagebox.askyesno(
+                    "Resume",
+                    f"Checkpoint ditemukan di frame {state['frame_index']} ({total} kendaraan).\n\n"
+                    f"Lanjutkan dari checkpoint?"
+                )
+            self.start_detection(file_path, resume=resume)
     
-    def start_detection(self, source):
-        """Start video detection."""
+    def start_detection(self, source, resume=False):
+        """Start video detection (resume=True continues from the last checkpoint)."""
+        if self._switching:
+            return
         if self.is_running:
             self.stop_video()
+        # The old job must write its final checkpoint before the engine is reset
+        if not self._wait_for_video_thread():
+            return
         
-        self.cap = cv2.VideoCapture(source)
+        self.source = source
+        self.cap = self._open_source(source)
         if not self.cap.isOpened():
             messagebox.showerror("Error", "Tidak dapat membuka video")
+            self.cap.release()
+            self.cap = None
             return
         
-        self.is_running = True
         self.detector_engine.reset_counters()
+        # Seeking happens on the detector thread, it can take a while on long files
+        state = CheckpointWriter.load(source) if resume else None
+        
+        checkpoint = CheckpointWriter(source, interval_s=self.checkpoint_interval_s)
+        self.is_running = True
         self.update_stats()
         
-        self.video_thread = threading.Thread(target=self._detect_thread, daemon=True)
+        self.video_thread = threading.Thread(target=self._detect_thread, args=(self.cap, checkpoint, state),
+                                             daemon=True)
         self.video_thread.start()
         
         self.gui.update_status(f"Status: Processing | Device: {self.device.upper()} ")
     
-    def _detect_thread(self):
+    def _open_source(self, source):
+        """Open a video source scaled to the detector frame size."""
+        return open_video_source(
+            source,
+            width=self.detector_engine.frame_width,
+            height=self.detector_engine.frame_height,
+            backend=self.video_backend
+        )
+    
+    def _wait_for_video_thread(self):
+        """Join the detector thread, keeping Tk responsive (it may be waiting on root.after).
+        
+        Returns False if the window was closed meanwhile (caller must not continue).
+        """
+        thread = self.video_thread
+        self._switching = True
+        try:
+            while thread is not None and thread.is_alive():
+                thread.join(timeout=0.05)
+                try:
+                    self.root.update()
+                except tk.TclError:
+                    return False
+        finally:
+            self._switching = False
+        
+        if self.video_thread is thread:
+            self.video_thread = None
+        if self._closing:
+            # Close was requested during the wait, finish it now
+            self.root.destroy()
+            return False
+        return True
+    
+    def _set_status_async(self, text):
+        """Update status label from the detector thread."""
+        try:
+            self.root.after(0, lambda: self.gui.update_status(text))
+        except Exception:
+            pass
+    
+    def _resume_source(self, cap, state):
+        """Position cap at the checkpoint frame (detector thread).
+        
+        Returns 'resumed', 'failed' or 'stopped'. Only a seek that lands short of the
+        target is completed by decoding forward; a failed seek never skips from frame 0.
+        """
+        target = state['frame_index']
+        self._set_status_async(f"Status: Resuming ke frame {target}...")
+        if not cap.seek(target):
+            if not (0 < cap.frame_index < target):
+                return 'failed'
+            # Seek landed short (keyframes): decode forward without inference, in chunks
+            while cap.frame_index < target:
+                if not self.is_running:
+                    return 'stopped'
+                if not cap.skip(min(self.resume_skip_chunk, target - cap.frame_index)):
+                    return 'failed'
+                self._set_status_async(f"Status: Resuming {cap.frame_index}/{target}...")
+        return 'resumed'
+    
+    def _detect_thread(self, cap, checkpoint, resume_state=None):
         """Thread wrapper for detection loop."""
+        if resume_state is not None:
+            result = self._resume_source(cap, resume_state)
+            if result == 'resumed':
+                self.detector_engine.restore_state(resume_state)
+                self.root.after(0, self.update_stats)
+                print(f"Resumed from frame {resume_state['frame_index']}")
+            elif result == 'failed':
+                target = resume_state['frame_index']
+                self.root.after(0, lambda: messagebox.showwarning(
+                    "Resume",
+                    f"Tidak dapat melanjutkan dari frame {target}.\n\nVideo diproses dari awal."
+                ))
+                cap.release()
+                cap = self._open_source(checkpoint.source)
+                self.cap = cap
+            if result == 'stopped' or not self.is_running or not cap.isOpened():
+                # Stopped before any frame was processed: keep the existing checkpoint untouched
+                checkpoint.close()
+                cap.release()
+                if self.cap is cap:
+                    self.cap = None
+                self.stop_video()
+                return
+            self._set_status_async(f"Status: Processing | Device: {self.device.upper()} ")
+        
         self.detector_engine.detect_loop(
-            cap=self.cap,
+            cap=cap,
             is_running_callback=lambda: self.is_running,
             update_stats_callback=self.update_stats,
             update_fps_callback=self.update_fps,
-            root=self.root
+            root=self.root,
+            checkpoint=checkpoint
         )
+        # Release on this thread: the source must not be closed while read() is decoding
+        cap.release()
+        if self.cap is cap:
+            self.cap = None
         # Wloop ends, stopp video
         self.stop_video()
     
@@ -109,19 +235,13 @@ class TrafficDetectorGPU:
         """Update GUI statistics."""
         self.gui.update_stats(self.detector_engine.vehicle_counts)
     
-    def update_fps(self, fps, fps_color, detection_rate, gpu_mem):
+    def update_fps(self, fps, fps_color, detection_rate, gpu_mem, timing_ms=None):
         """Update FPS display."""
-        self.gui.update_fps_display(fps, fps_color, detection_rate, gpu_mem)
+        self.gui.update_fps_display(fps, fps_color, detection_rate, gpu_mem, timing_ms)
     
     def stop_video(self):
-        """Stop video processing."""
+        """Stop video processing (the detector thread releases the source when its loop exits)."""
         self.is_running = False
-        if self.cap:
-            try:
-                self.cap.release()
-            except Exception:
-                pass
-            self.cap = None
         # Tkinter is not thread-safe; always update widgets via main thread
         try:
             self.root.after(0, lambda: self.gui.update_status("Status: Stopped"))
@@ -130,7 +250,14 @@ class TrafficDetectorGPU:
     
     def reset_all(self):
         """Reset all counters and UI."""
+        if self._switching:
+            return
         self.stop_video()
+        if not self._wait_for_video_thread():
+            return
+        # Reset discards progress, including the saved checkpoint
+        if self.source is not None:
+            CheckpointWriter.remove(self.source)
         self.detector_engine.reset_counters()
         self.update_stats()
         self.gui.clear_video_display()
@@ -139,8 +266,13 @@ class TrafficDetectorGPU:
     
     def on_closing(self):
         """Handle window closing."""
+        self._closing = True
         self.stop_video()
-        self.root.destroy()
+        if self._switching:
+            # The wait in progress destroys the window once the thread has exited
+            return
+        # Let the detector thread flush its final checkpoint (destroys the window)
+        self._wait_for_video_thread()
 
 
 def main():
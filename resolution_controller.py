@@ -0,0 +1,97 @@
+class ResolutionController:
+    """Picks the YOLO inference input size (imgsz) to stay within a latency budget."""
+
+    # Multiples of 32 accepted by ultralytics letterboxing
+    SUPPORTED_SIZES = (320, 416, 512, 640)
+
+    def __init__(self, device, target_latency_ms=None, sizes=SUPPORTED_SIZES, initial_size=640):
+        self.sizes = tuple(sorted(sizes))
+        self.device = device
+
+        # Latency budget per frame (inference only), default follows the FPS color thresholds
+        if target_latency_ms is None:
+            target_latency_ms = 28.0 if device == 'cuda' else 100.0
+        self.target_latency_ms = target_latency_ms
+
+        # Control parameters
+        self.enabled = True
+        self.warmup_frames = 10       # first calls include CUDA/cudnn setup, ignore them
+        self.window_frames = 30       # frames between decisions
+        self.cooldown_frames = 60     # minimum frames between two size changes
+        self.upscale_headroom = 0.75  # only grow if the predicted latency stays below this share of budget
+        self.small_box_px = 40        # mean box height (in 640x480 frame) considered "small objects"
+        self.ema_alpha = 0.1
+
+        self.current_size = min(self.sizes, key=lambda s: abs(s - initial_size))
+        self.reset()
+
+    def reset(self):
+        """Reset measurements (keeps the current size, latency depends on hardware not video)."""
+        self.latency_ema = None
+        self.detection_rate_ema = None
+        self.box_height_ema = None
+        self._samples = 0
+        self._frames_since_change = 0
+        self._frames_since_decision = 0
+
+    def _ema(self, prev, value):
+        if prev is None:
+            return value
+        return prev + self.ema_alpha * (value - prev)
+
+    def update(self, latency_ms, has_detections, mean_box_height=None):
+        """Feed one frame of measurements."""
+        self._samples += 1
+        self._frames_since_change += 1
+        self._frames_since_decision += 1
+
+        if self._samples <= self.warmup_frames:
+            return
+
+        self.latency_ema = self._ema(self.latency_ema, latency_ms)
+        self.detection_rate_ema = self._ema(self.detection_rate_ema, 1.0 if has_detections else 0.0)
+        if mean_box_height is not None:
+            self.box_height_ema = self._ema(self.box_height_ema, mean_box_height)
+
+    def _predicted_latency(self, size):
+        """Estimate latency at another size (compute scales roughly with pixel count)."""
+        return self.latency_ema * (size / self.current_size) ** 2
+
+    def propose(self, safe_point):
+        """Return the new input size if it should change now, else None.
+
+        Changes are only made at safe points (no vehicle inside the counting zone)
+        so box jitter from a resolution switch cannot cause a missed or double count.
+        """
+        if not self.enabled or self.latency_ema is None:
+            return None
+        if self._frames_since_decision < self.window_frames:
+            return None
+        if self._frames_since_change < self.cooldown_frames or not safe_point:
+            return None
+        self._frames_since_decision = 0
+
+        idx = self.sizes.index(self.current_size)
+        new_size = None
+
+        if self.latency_ema > self.target_latency_ms and idx > 0:
+            # Over budget: step down one size at a time (smooth degradation)
+            new_size = self.sizes[idx - 1]
+        elif idx < len(self.sizes) - 1:
+            bigger = self.sizes[idx + 1]
+            fits = self._predicted_latency(bigger) <= self.target_latency_ms * self.upscale_headroom
+            small_objects = self.box_height_ema is not None and self.box_height_ema < self.small_box_px
+            low_recall = self.detection_rate_ema is not None and self.detection_rate_ema < 0.5
+            # Grow back when there is headroom; with clear spare budget grow regardless of scene
+            if fits and (small_objects or low_recall
+                         or self._predicted_latency(bigger) <= self.target_latency_ms * 0.5):
+                new_size = bigger
+
+        if new_size is None:
+            return None
+
+        self.current_size = new_size
+        self._frames_since_change = 0
+        # Latency EMA belongs to the old size; rescale so the next decision starts from an estimate
+        self.latency_ema = self.latency_ema * (new_size / self.sizes[idx]) ** 2
+        return new_size
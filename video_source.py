@@ -0,0 +1,201 @@
+import cv2
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class OpenCVVideoSource:
+    """cv2.VideoCapture backend (fallback): decodes at full resolution, resizes afterwards."""
+
+    name = 'opencv'
+
+    def __init__(self, source, width, height):
+        self.width = width
+        self.height = height
+        self.cap = cv2.VideoCapture(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.frame_index = 0
+
+    def isOpened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self):
+        if self.cap is None:
+            return False, None
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.frame_index += 1
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height))
+        return True, frame
+
+    def skip(self, count):
+        """Skip frames without retrieving/converting them."""
+        if self.cap is None:
+            return False
+        for _ in range(count):
+            if not self.cap.grab():
+                return False
+            self.frame_index += 1
+        return True
+
+    def seek(self, frame_index):
+        """Jump to a frame index (next read() returns that frame)."""
+        if self.cap is None:
+            return False
+        if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+            # Not seekable; callers decide whether decoding forward is acceptable
+            return False
+        # frame_index reports where the seek actually landed
+        self.frame_index = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        return self.frame_index == frame_index
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class PyAVVideoSource:
+    """FFmpeg (PyAV) backend.
+
+    Frames are still decoded at source resolution; the gain is that swscale resizes
+    in YUV and converts to BGR in one pass, so no full-size BGR frame or cv2.resize.
+    """
+
+    name = 'pyav'
+
+    # Consecutive decode errors tolerated (bad packets are skipped) before giving up
+    max_decode_errors = 50
+
+    def __init__(self, source, width, height):
+        self.width = width
+        self.height = height
+        self.container = av.open(source)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'  # frame/slice threading in the decoder
+        self.time_base = self.stream.time_base
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 30.0)
+        self.frame_count = int(self.stream.frames or 0)
+        self.frame_index = 0
+        self._frames = self.container.decode(self.stream)
+
+        # to_ndarray() ignores display rotation, OpenCV applies it; refuse rotated videos
+        # so open_video_source() falls back and both backends give the same image
+        first = self._next_frame()
+        if first is not None:
+            rotation = self._rotation(first)
+            if rotation:
+                self.release()
+                raise ValueError(f"rotated video ({rotation} deg) not supported by PyAV source")
+            self._frames = self._chain(first, self._frames)
+
+    def _rotation(self, frame):
+        """Display rotation in degrees from frame side data or legacy stream metadata."""
+        rotation = getattr(frame, 'rotation', 0) or 0
+        if not rotation:
+            try:
+                rotation = int(float(self.stream.metadata.get('rotate', 0)))
+            except (TypeError, ValueError):
+                rotation = 0
+        return rotation % 360
+
+    def isOpened(self):
+        return self.container is not None
+
+    def _next_frame(self):
+        """Next decoded frame, None only at end of stream (decode errors raise)."""
+        if self.container is None:
+            return None
+        errors = 0
+        while True:
+            try:
+                return next(self._frames)
+            except StopIteration:
+                return None
+            except av.error.FFmpegError as e:
+                errors += 1
+                if errors > self.max_decode_errors:
+                    raise
+                print(f"Decode error skipped: {e}")
+                # The failed generator is finished; continue demuxing from the current packet
+                self._frames = self.container.decode(self.stream)
+
+    def read(self):
+        frame = self._next_frame()
+        if frame is None:
+            return False, None
+        self.frame_index += 1
+        # swscale resize + colour conversion in one pass (decode itself is full resolution)
+        image = frame.to_ndarray(width=self.width, height=self.height, format='bgr24')
+        return True, image
+
+    def skip(self, count):
+        """Skip frames: decode only, no scaling or conversion."""
+        for _ in range(count):
+            if self._next_frame() is None:
+                return False
+            self.frame_index += 1
+        return True
+
+    def seek(self, frame_index):
+        """Seek to nearest keyframe before frame_index, then decode forward to it."""
+        if self.container is None:
+            return False
+        if frame_index <= 0:
+            target_pts = self.stream.start_time or 0
+        else:
+            target_pts = int(frame_index / self.fps / self.time_base) + (self.stream.start_time or 0)
+        self.container.seek(target_pts, stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+
+        # Drop frames until the target; put the first one at/after target back for read()
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                # Past the end: rewind so frame_index stays truthful
+                start = self.stream.start_time or 0
+                self.container.seek(start, stream=self.stream, backward=True, any_frame=False)
+                self._frames = self.container.decode(self.stream)
+                self.frame_index = 0
+                return False
+            if frame.pts is None or frame.pts >= target_pts:
+                break
+        self.frame_index = frame_index
+        self._frames = self._chain(frame, self._frames)
+        return True
+
+    @staticmethod
+    def _chain(first, frames):
+        yield first
+        yield from frames
+
+    def release(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+def open_video_source(source, width=640, height=480, backend='auto'):
+    """Open a video with the best available decoder.
+
+    backend: 'auto' (PyAV if installed, else OpenCV), 'pyav' or 'opencv'.
+    Camera indices always use OpenCV.
+    """
+    use_pyav = backend == 'pyav' or (backend == 'auto' and av is not None)
+    if use_pyav and not isinstance(source, int):
+        try:
+            src = PyAVVideoSource(source, width, height)
+            print(f"Video decoder: PyAV ({src.stream.codec_context.name}, scaled to {width}x{height})")
+            return src
+        except Exception as e:
+            if backend == 'pyav':
+                raise
+            print(f"PyAV failed ({e}), falling back to OpenCV")
+
+    print("Video decoder: OpenCV")
+    return OpenCVVideoSource(source, width, height)